@@ -13,7 +13,7 @@ echo [INFO] Activating virtual environment...
 call .venv\Scripts\activate
 
 echo [INFO] Installing necessary packages...
-pip install pyinstaller ibapi tradingview_ta
+pip install pyinstaller ibapi tradingview_ta orjson
 if %errorlevel% neq 0 (
     echo [ERROR] Failed to install required packages. Check your internet connection.
     pause
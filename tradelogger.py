@@ -2,12 +2,17 @@ import tkinter as tk
 from tkinter import ttk, messagebox, Toplevel
 import json
 import os
-from threading import Thread
+import queue
+from threading import Thread, Lock
+from concurrent.futures import ThreadPoolExecutor
 import time
 from datetime import datetime
 import sys # Import sys to check for the max float value
-import math # Import math for floor and ceil
+import math # Import math for the -inf sort sentinel
 import csv # Import for CSV export functionality
+from operator import itemgetter, attrgetter
+from collections import namedtuple
+from functools import partial
 
 # Attempt to import the ibapi library
 try:
@@ -17,7 +22,9 @@ try:
     from ibapi.order import Order
     from ibapi.execution import ExecutionFilter, Execution
     from ibapi.commission_report import CommissionReport
+    IBAPI_AVAILABLE = True
 except ImportError:
+    IBAPI_AVAILABLE = False
     # Provide a user-friendly message if ibapi is not installed
     print("Error: The 'ibapi' package is not installed.")
     print("Please install it by running: pip install ibapi")
@@ -28,75 +35,217 @@ except ImportError:
 # Attempt to import the tradingview_ta library
 try:
     from tradingview_ta import TA_Handler, Interval
+    TRADINGVIEW_TA_AVAILABLE = True
 except ImportError:
+    TRADINGVIEW_TA_AVAILABLE = False
     print("Error: The 'tradingview_ta' package is not installed.")
     print("Please install it by running: pip install tradingview_ta")
     # Create a dummy class to avoid further errors
     class TA_Handler: pass
     class Interval: pass
 
+# orjson is optional; it serializes straight to bytes and is much faster than the stdlib json
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads # Accepts bytes too, so callers can always read files in binary mode
+
 
 # --- Configuration Management ---
 CONFIG_FILE = "config.json"
-TRADES_FILE = "trades.json"
-BALANCE_HISTORY_FILE = "accountBalances.json"
+TRADES_FILE = "trades.jsonl"
+LEGACY_TRADES_FILE = "trades.json"
+BALANCE_HISTORY_FILE = "accountBalances.jsonl"
+LEGACY_BALANCE_HISTORY_FILE = "accountBalances.json"
+TRADES_FLUSH_SECONDS = 30
+TRADES_WRITE_COALESCE_SECONDS = 0.25
+ACCOUNT_SUMMARY_DEBOUNCE_SECONDS = 1.0
+CSV_EXPORT_BUFFER_SIZE = 1 << 20
+PRICE_CACHE_TTL_SECONDS = 10
+
+def _dumps_bytes(obj):
+    """Serializes obj to indented JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=4).encode('utf-8')
+
+def atomic_write_bytes(path, data):
+    """Writes data to a temp file and swaps it into place, so a crash never leaves a truncated file."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f: f.write(data)
+    os.replace(tmp_path, path)
+
+_CFG_CACHE = {} # Parsed config keyed by the file's stat signature, shared by the Tk and fetch threads
+_CFG_LOCK = Lock()
+_CFG_WRITE_LOCK = Lock() # Held across read-modify-write, since Settings and TradingView lookups save from different threads
+
+def _read_config_file():
+    """Reads a copy of the raw config dict (re-parsed only when the file's stat signature changes), or {} if missing or invalid."""
+    try: st = os.stat(CONFIG_FILE)
+    except FileNotFoundError: return {}
+    sig = (st.st_mtime_ns, st.st_size, st.st_ino)
+    with _CFG_LOCK:
+        if _CFG_CACHE.get('sig') == sig: return dict(_CFG_CACHE['val'])
+        try:
+            with open(CONFIG_FILE, 'rb') as f: config = _loads(f.read())
+        except (FileNotFoundError, ValueError): config = {}
+        if not isinstance(config, dict): config = {}
+        _CFG_CACHE['sig'], _CFG_CACHE['val'] = sig, config
+        return dict(config)
+
+def _write_config_file(config):
+    """Writes the raw config dict to the JSON config file. Returns True on success."""
+    try:
+        atomic_write_bytes(CONFIG_FILE, _dumps_bytes(config))
+        with _CFG_LOCK: _CFG_CACHE.clear()
+        return True
+    except IOError as e:
+        print(f"Error: Could not write to config file {CONFIG_FILE}. Reason: {e}")
+        return False
+
+def _update_config_file(updates):
+    """Merges updates into the stored config under one lock, so concurrent saves keep each other's keys. Returns True on success."""
+    with _CFG_WRITE_LOCK:
+        config = _read_config_file()
+        config.update(updates)
+        return _write_config_file(config)
 
 def save_config(host, port, client_id, auto_refresh_enabled, auto_refresh_seconds, auto_connect_enabled):
-    """Saves connection settings to a JSON file. Returns True on success."""
-    config = {
+    """Saves connection settings to a JSON file, keeping any other stored keys. Returns True on success."""
+    return _update_config_file({
         "host": host,
         "port": port,
         "clientId": client_id,
         "auto_refresh_enabled": auto_refresh_enabled,
         "auto_refresh_seconds": auto_refresh_seconds,
         "auto_connect_on_startup": auto_connect_enabled
-    }
-    try:
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=4)
-        return True
-    except IOError as e:
-        print(f"Error: Could not write to config file {CONFIG_FILE}. Reason: {e}")
-        return False
+    })
 
 def load_config():
     """Loads connection settings from a JSON file."""
-    if not os.path.exists(CONFIG_FILE):
-        return "127.0.0.1", 7497, 1, True, 5, False
+    config = _read_config_file()
+    host = config.get("host", "127.0.0.1")
+    port = config.get("port", 7497)
+    client_id = config.get("clientId", 1)
+    auto_refresh_enabled = config.get("auto_refresh_enabled", True)
+    auto_refresh_seconds = config.get("auto_refresh_seconds", 5)
+    auto_connect_enabled = config.get("auto_connect_on_startup", False)
+    return host, port, client_id, auto_refresh_enabled, auto_refresh_seconds, auto_connect_enabled
+
+def save_ticker_exchanges(ticker_exchanges):
+    """Stores the ticker -> exchange map that last resolved a TradingView price. Returns True on success."""
+    return _update_config_file({"ticker_exchanges": ticker_exchanges})
+
+def load_ticker_exchanges():
+    """Loads the ticker -> exchange map used to try the known exchange first."""
+    ticker_exchanges = _read_config_file().get("ticker_exchanges", {})
+    return dict(ticker_exchanges) if isinstance(ticker_exchanges, dict) else {}
+
+def _dumps_line(obj):
+    """Serializes obj to a single JSON-lines record (compact, newline-terminated); Decimals (e.g. newer ibapi share counts) are stored as floats."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=float) + b'\n'
+    return json.dumps(obj, default=float).encode('utf-8') + b'\n'
+
+def _write_jsonl(path, records):
+    """Rewrites a JSON-lines file with one line per record."""
+    atomic_write_bytes(path, b''.join(_dumps_line(record) for record in records))
+
+def _append_jsonl(path, records):
+    """Appends records to a JSON-lines file in a single write, first ending a torn last line left by a crash mid-append."""
+    lines = []
+    for record in records: # Serialized one by one so a record that can't be stored doesn't drop the rest of the batch
+        try: lines.append(_dumps_line(record))
+        except (TypeError, ValueError) as e: print(f"Error: Could not serialize a record for {path}. Reason: {e}")
+    if not lines: return
+    data = b''.join(lines)
+    with open(path, 'a+b') as f:
+        end = f.seek(0, os.SEEK_END)
+        if end:
+            f.seek(end - 1)
+            if f.read(1) != b'\n': data = b'\n' + data # Otherwise the first new record would be glued onto the torn one
+        f.write(data)
+
+def _iter_jsonl(path, legacy_path):
+    """Yields the records of a JSON-lines file, migrating the legacy JSON array file if only that exists."""
     try:
-        with open(CONFIG_FILE, 'r') as f:
-            config = json.load(f)
-            host = config.get("host", "127.0.0.1")
-            port = config.get("port", 7497)
-            client_id = config.get("clientId", 1)
-            auto_refresh_enabled = config.get("auto_refresh_enabled", True)
-            auto_refresh_seconds = config.get("auto_refresh_seconds", 5)
-            auto_connect_enabled = config.get("auto_connect_on_startup", False)
-            return host, port, client_id, auto_refresh_enabled, auto_refresh_seconds, auto_connect_enabled
-    except (json.JSONDecodeError, KeyError):
-        return "127.0.0.1", 7497, 1, True, 5, False
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        try:
+            with open(legacy_path, 'rb') as legacy_file: records = _loads(legacy_file.read())
+        except (FileNotFoundError, ValueError): return
+        records = [record for record in records if isinstance(record, dict)] if isinstance(records, list) else []
+        _write_jsonl(path, records)
+        yield from records
+        return
+    with f:
+        for line in f:
+            if not line.strip(): continue
+            try: record = _loads(line)
+            except ValueError: continue # Skip a torn or corrupt record instead of dropping the whole file
+            if isinstance(record, dict): yield record
 
 def save_trades(trades):
-    """Saves the list of trades to a JSON file."""
-    with open(TRADES_FILE, 'w') as f: json.dump(trades, f, indent=4)
+    """Rewrites the JSON-lines trade log with a compacted snapshot of all trades."""
+    _write_jsonl(TRADES_FILE, trades)
+
+def append_trades(trades):
+    """Appends new trade records to the JSON-lines trade log."""
+    _append_jsonl(TRADES_FILE, trades)
 
 def load_trades():
-    """Loads the list of trades from a JSON file."""
-    if not os.path.exists(TRADES_FILE): return []
+    """Loads the list of trades from the JSON-lines trade log."""
+    return list(_iter_jsonl(TRADES_FILE, LEGACY_TRADES_FILE))
+
+def append_balance_record(record):
+    """Appends a single balance record to the JSON-lines balance history."""
+    _append_jsonl(BALANCE_HISTORY_FILE, [record])
+
+def iter_balance_history():
+    """Streams the balance history records from the JSON-lines balance file."""
+    return _iter_jsonl(BALANCE_HISTORY_FILE, LEGACY_BALANCE_HISTORY_FILE)
+
+# A loaded balance history record: the stored fields plus its parsed/formatted balance and a stable row id
+BalanceRecord = namedtuple('BalanceRecord', 'account datetime balance balance_f balance_s iid')
+_fmt_bal = "${:,.2f}".format # Bound once and reused for every loaded record
+
+def _to_balance_record(record, iid):
+    """Converts a stored balance dict into a BalanceRecord, parsing and formatting the balance once."""
+    balance = record.get('Balance', 0.0)
     try:
-        with open(TRADES_FILE, 'r') as f: return json.load(f)
-    except json.JSONDecodeError: return []
+        balance_f = float(balance)
+        balance_s = _fmt_bal(balance_f)
+    except (ValueError, TypeError):
+        balance_f, balance_s = -math.inf, str(balance)
+    return BalanceRecord(str(record.get('Account', '')), str(record.get('DateTime', '')), balance, balance_f, balance_s, str(iid))
 
-def save_balance_history(history):
-    """Saves the balance history to a JSON file."""
-    with open(BALANCE_HISTORY_FILE, 'w') as f: json.dump(history, f, indent=4)
+# Parsed balance history and how far into the file it reaches; once loaded it stays resident so reopening is stat-bound
+_HIST_CACHE = {"sig": None, "data": [], "offset": 0, "ino": None}
 
 def load_balance_history():
-    """Loads the balance history from a JSON file."""
-    if not os.path.exists(BALANCE_HISTORY_FILE): return []
-    try:
-        with open(BALANCE_HISTORY_FILE, 'r') as f: return json.load(f)
-    except json.JSONDecodeError: return []
+    """Loads the balance history, parsing only the lines appended since the previous call."""
+    try: st = os.stat(BALANCE_HISTORY_FILE)
+    except FileNotFoundError: # No JSON-lines file yet; this migrates a legacy file if there is one
+        return [_to_balance_record(record, i) for i, record in enumerate(iter_balance_history())]
+    sig = (st.st_mtime_ns, st.st_size, st.st_ino)
+    if _HIST_CACHE["sig"] != sig:
+        if _HIST_CACHE["ino"] != st.st_ino or st.st_size < _HIST_CACHE["offset"]: # Replaced or truncated: start over
+            _HIST_CACHE["data"], _HIST_CACHE["offset"] = [], 0
+        with open(BALANCE_HISTORY_FILE, 'rb') as f:
+            f.seek(_HIST_CACHE["offset"])
+            data = f.read()
+        end = data.rfind(b'\n') + 1 # Leave a partially written last line for the next call
+        history = _HIST_CACHE["data"]
+        for line in data[:end].splitlines():
+            if not line.strip(): continue
+            try: record = _loads(line)
+            except ValueError: continue
+            if isinstance(record, dict): history.append(_to_balance_record(record, len(history)))
+        _HIST_CACHE["offset"] += end
+        _HIST_CACHE["sig"], _HIST_CACHE["ino"] = sig, st.st_ino
+    return list(_HIST_CACHE["data"])
 
 # --- IBAPI Integration ---
 class IBApp(EWrapper, EClient):
@@ -177,15 +326,33 @@ class TradeLoggerApp:
 
         self.ib_app = None
         self.trades = load_trades()
-        self.trade_exec_ids = {trade['ExecId'] for trade in self.trades if 'ExecId' in trade}
+        self.trade_exec_ids = set(filter(None, (trade.get('ExecId') for trade in self.trades)))
         self.exec_id_to_tree_id = {}
+        self.exec_id_to_trade = {} # Filled alongside exec_id_to_tree_id by _repopulate_tree
+        self.dirty_exec_ids = set()
+        self.trades_flush_job = None
+        self._save_queue = queue.Queue()
+        self._writer_thread = Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
         self.last_status_message = ""
+        self.status_restore_job = None
         self.auto_refresh_job = None
+        self.settings_window = None
         self.managed_accounts = []
+        self.last_summary_request = 0.0
+        self.ticker_exchanges = load_ticker_exchanges()
+        self.price_cache = {}
+        self.tv_pool = ThreadPoolExecutor(max_workers=2)
+        self.tv_future = None
+        # Only the latest record per account is kept here; the full history is first parsed (and cached) when it is shown or exported
+        self.latest_balance_record = {record.get("Account"): record for record in iter_balance_history()} # Later records win
+        self._calc_pending = False
         self._load_app_config()
         
         self.sort_column = "Time"
         self.sort_reverse = True
+        self._sort_key = self._make_sort_key(self.sort_column)
+        self.trades.sort(key=self._sort_key, reverse=self.sort_reverse) # Keep trades sorted so new ones can be inserted in place
 
         self._setup_styles()
         self._setup_ui()
@@ -206,6 +373,7 @@ class TradeLoggerApp:
         style.configure("Result.TLabel", font=('Calibri', 10, 'bold'), background="#f8f9fa")
         style.configure("Input.TLabel", background="#f8f9fa")
         style.configure('Stepper.TButton', padding=(2, 2), font=('Calibri', 8))
+        style.configure('Settings.TEntry', padding=2)
 
     def _setup_ui(self):
         main_pane = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
@@ -239,6 +407,8 @@ class TradeLoggerApp:
         self.settings_button.pack(side=tk.LEFT, padx=(0, 5))
 
         self.columns = ("Time", "Instrument", "Action", "Quantity", "Price", "Account", "Commission", "Realized P&L")
+        self.row_getter = itemgetter(*self.columns) # Pulls a trade's display columns in one C-level call
+        self.money_column_indexes = (self.columns.index("Commission"), self.columns.index("Realized P&L"))
         self.tree = ttk.Treeview(trades_frame, columns=self.columns, show="headings")
         self.tree.pack(fill=tk.BOTH, expand=True)
 
@@ -279,6 +449,7 @@ class TradeLoggerApp:
         
         self.calc_vars = { 'Ticker': tk.StringVar(), 'AccountBalance': tk.DoubleVar(), 'RiskPrct': tk.DoubleVar(value=1.0), 'Entry': tk.DoubleVar(), 'Stop': tk.DoubleVar(), 'Target': tk.DoubleVar(), 'SelectedAccount': tk.StringVar() }
         for var in ['AccountBalance', 'RiskPrct', 'Entry', 'Stop', 'Target']: self.calc_vars[var].trace_add("write", self.update_calculations)
+        self.calc_getters = tuple(self.calc_vars[var].get for var in ['AccountBalance', 'RiskPrct', 'Entry', 'Stop', 'Target']) # Bound once, read on every recompute
 
         # Helper function to create a row with steppers
         def create_input_row(label_text, row, variable, stepper_amount=None):
@@ -318,6 +489,7 @@ class TradeLoggerApp:
 
         ttk.Separator(calc_frame, orient=tk.HORIZONTAL).grid(row=7, column=0, columnspan=3, sticky="ew", pady=10)
 
+        self.calc_result_text = {} # Last text pushed to each result var, to skip unchanged Tcl writes
         self.calc_result_vars = { 'AccountAtRiskPrct': tk.StringVar(value="0.00 %"), 'PositionSize': tk.StringVar(value="$0"), 'Acc1R': tk.StringVar(value="$0.00"), 'Risk-per-Share': tk.StringVar(value="$0.00"), 'Reward-Risk': tk.StringVar(value="0.00"), 'Potential': tk.StringVar(value="$0.00"), 'ShareSizeToBuy': tk.StringVar(value="0") }
         
         row_idx = 8
@@ -327,46 +499,74 @@ class TradeLoggerApp:
             row_idx += 1
 
     def update_calculations(self, *args):
+        # Coalesce bursts of variable writes (e.g. Entry/Stop/Target set together) into one recompute
+        if self._calc_pending: return
+        self._calc_pending = True
+        self.root.after(30, self._do_update_calculations)
+
+    def _do_update_calculations(self):
+        self._calc_pending = False
         try:
-            balance, risk_prct, entry, stop, target = self.calc_vars['AccountBalance'].get(), self.calc_vars['RiskPrct'].get() / 100.0, self.calc_vars['Entry'].get(), self.calc_vars['Stop'].get(), self.calc_vars['Target'].get()
+            balance_get, risk_get, entry_get, stop_get, target_get = self.calc_getters
+            balance, risk_prct, entry, stop, target = balance_get(), risk_get() / 100.0, entry_get(), stop_get(), target_get()
             if not (0.0001 <= risk_prct <= 1): risk_prct = 0.01
             acc_1r = balance * risk_prct
             risk_per_share = abs(entry - stop) if entry > 0 and stop > 0 else 0
-            share_size = math.floor(acc_1r / risk_per_share) if risk_per_share > 0 else 0
-            position_size = math.ceil(entry * share_size)
+            # x // 1 floors a float and -(-x // 1) ceils it; divide first so e.g. 10 / 0.1 still floors to 100
+            share_size = int(acc_1r / risk_per_share // 1) if risk_per_share > 0 else 0
+            position_size = int(-(-entry * share_size // 1))
             potential_per_share = abs(target - entry) if target > 0 else 0
             reward_risk_ratio = (potential_per_share / risk_per_share) if risk_per_share > 0 else 0
             potential_profit = potential_per_share * share_size
             account_at_risk_prct = (position_size / balance * 100) if balance > 0 else 0
             
-            reward_risk_ratio_rounded, account_at_risk_prct_rounded = math.floor(reward_risk_ratio * 100) / 100, math.floor(account_at_risk_prct * 100) / 100
-
-            self.calc_result_vars['Acc1R'].set(f"${acc_1r:,.2f}")
-            self.calc_result_vars['Risk-per-Share'].set(f"${risk_per_share:,.2f}")
-            self.calc_result_vars['ShareSizeToBuy'].set(f"{share_size:,}")
-            self.calc_result_vars['PositionSize'].set(f"${position_size:,.0f}")
-            self.calc_result_vars['AccountAtRiskPrct'].set(f"{account_at_risk_prct_rounded:.2f} %")
-            self.calc_result_vars['Reward-Risk'].set(f"{reward_risk_ratio_rounded:.2f}")
-            self.calc_result_vars['Potential'].set(f"${potential_profit:,.2f}")
+            reward_risk_ratio_rounded, account_at_risk_prct_rounded = reward_risk_ratio * 100 // 1 / 100, account_at_risk_prct * 100 // 1 / 100
+
+            results = {
+                'Acc1R': f"${acc_1r:,.2f}",
+                'Risk-per-Share': f"${risk_per_share:,.2f}",
+                'ShareSizeToBuy': f"{share_size:,}",
+                'PositionSize': f"${position_size:,.0f}",
+                'AccountAtRiskPrct': f"{account_at_risk_prct_rounded:.2f} %",
+                'Reward-Risk': f"{reward_risk_ratio_rounded:.2f}",
+                'Potential': f"${potential_profit:,.2f}",
+            }
+            for name, text in results.items():
+                if self.calc_result_text.get(name) != text:
+                    self.calc_result_text[name] = text
+                    self.calc_result_vars[name].set(text)
         except (tk.TclError, ValueError): pass
 
     def fetch_ticker_price_threaded(self):
-        Thread(target=self.fetch_ticker_price_from_tv, daemon=True).start()
+        if self.tv_future and not self.tv_future.done(): self.tv_future.cancel() # Drop a fetch that hasn't started yet
+        self.tv_future = self.tv_pool.submit(self.fetch_ticker_price_from_tv)
 
     def fetch_ticker_price_from_tv(self):
         ticker = self.calc_vars['Ticker'].get().strip().upper()
         if not ticker:
             self.root.after(0, lambda: messagebox.showwarning("Input Required", "Please enter a ticker symbol."))
             return
+        cached = self.price_cache.get(ticker)
+        if cached and time.monotonic() - cached[1] < PRICE_CACHE_TTL_SECONDS:
+            self.root.after(0, lambda p=cached[0]: self.update_entry_price(p))
+            return
         self.root.after(0, lambda: self.update_status(f"Fetching price for {ticker}...", is_temporary=True))
         exchanges, price_found = ["NASDAQ", "NYSE", "AMEX", "ARCA"], False
+        known_exchange = self.ticker_exchanges.get(ticker)
+        if known_exchange in exchanges: # Try the exchange that resolved this ticker last time first
+            exchanges.remove(known_exchange)
+            exchanges.insert(0, known_exchange)
         for exchange in exchanges:
             try:
                 handler = TA_Handler(symbol=ticker, screener="america", exchange=exchange, interval=Interval.INTERVAL_1_DAY)
                 price = handler.get_analysis().indicators["close"]
                 if price is not None:
+                    self.price_cache[ticker] = (price, time.monotonic())
                     self.root.after(0, lambda p=price: self.update_entry_price(p))
                     price_found = True
+                    if exchange != known_exchange:
+                        self.ticker_exchanges[ticker] = exchange
+                        save_ticker_exchanges(dict(self.ticker_exchanges))
                     break
             except Exception as e:
                 print(f"TradingView fetch error for {ticker} on {exchange}: {e}")
@@ -396,7 +596,19 @@ class TradeLoggerApp:
     def on_account_selected(self, event=None):
         account = self.calc_vars['SelectedAccount'].get()
         if account and self.ib_app and self.ib_app.isConnected():
-            self.ib_app.reqAccountSummary(self.ib_app.get_next_req_id(), "All", "NetLiquidation")
+            # Use the last NetLiquidation already received for this account; a debounced request may not send again
+            latest_entry = self.latest_balance_record.get(account)
+            if latest_entry is not None:
+                try: self.calc_vars['AccountBalance'].set(float(latest_entry.get("Balance", 0.0)))
+                except (ValueError, TypeError): pass
+            self._request_net_liquidation()
+
+    def _request_net_liquidation(self):
+        """Requests NetLiquidation for all accounts, skipping repeats within ACCOUNT_SUMMARY_DEBOUNCE_SECONDS."""
+        now = time.monotonic()
+        if now - self.last_summary_request < ACCOUNT_SUMMARY_DEBOUNCE_SECONDS: return
+        self.last_summary_request = now
+        self.ib_app.reqAccountSummary(self.ib_app.get_next_req_id(), "All", "NetLiquidation")
     
     def update_account_balance(self, account, value):
         if account == self.calc_vars['SelectedAccount'].get():
@@ -405,16 +617,11 @@ class TradeLoggerApp:
     def log_account_balance(self, account, balance_str):
         try:
             new_balance = float(balance_str)
-            history = load_balance_history()
-            latest_entry = None
-            for record in reversed(history):
-                if record.get("Account") == account:
-                    latest_entry = record
-                    break
+            latest_entry = self.latest_balance_record.get(account)
             if latest_entry is None or float(latest_entry.get("Balance", 0.0)) != new_balance:
                 new_record = { "Account": account, "DateTime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Balance": new_balance }
-                history.append(new_record)
-                save_balance_history(history)
+                self.latest_balance_record[account] = new_record
+                append_balance_record(new_record)
                 print(f"Logged new balance for {account}: {new_balance}")
         except ValueError:
             print(f"Could not log balance for {account}, invalid value: {balance_str}")
@@ -422,8 +629,7 @@ class TradeLoggerApp:
     def take_balance_snapshot(self):
         if self.ib_app and self.ib_app.isConnected() and self.managed_accounts:
             self.update_status("Requesting balance snapshot...", is_temporary=True)
-            for acc in self.managed_accounts:
-                self.ib_app.reqAccountSummary(self.ib_app.get_next_req_id(), "All", "NetLiquidation")
+            self._request_net_liquidation() # The "All" group reports every managed account in one request
         else:
             messagebox.showwarning("Not Connected", "Please connect to TWS to take a balance snapshot.")
 
@@ -436,10 +642,11 @@ class TradeLoggerApp:
             return
         filename = "trades_export.csv"
         try:
-            with open(filename, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=self.trades[0].keys())
-                writer.writeheader()
-                writer.writerows(self.trades)
+            fields = list(self.trades[0].keys())
+            with open(filename, 'w', newline='', encoding='utf-8', buffering=CSV_EXPORT_BUFFER_SIZE) as f:
+                writer = csv.writer(f)
+                writer.writerow(fields)
+                writer.writerows([trade.get(field, '') for field in fields] for trade in self.trades)
             messagebox.showinfo("Export Success", f"Trades successfully exported to {os.path.abspath(filename)}")
         except IOError as e:
             messagebox.showerror("Export Error", f"Could not write to file {filename}.\nReason: {e}")
@@ -451,54 +658,80 @@ class TradeLoggerApp:
             return
         filename = "balances_export.csv"
         try:
-            with open(filename, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=history[0].keys())
-                writer.writeheader()
-                writer.writerows(history)
+            with open(filename, 'w', newline='', encoding='utf-8', buffering=CSV_EXPORT_BUFFER_SIZE) as f:
+                writer = csv.writer(f)
+                writer.writerow(("Account", "DateTime", "Balance"))
+                writer.writerows((record.account, record.datetime, record.balance) for record in history)
             messagebox.showinfo("Export Success", f"Balance history successfully exported to {os.path.abspath(filename)}")
         except IOError as e:
             messagebox.showerror("Export Error", f"Could not write to file {filename}.\nReason: {e}")
 
     def sort_by_column(self, col):
         if self.sort_column == col: self.sort_reverse = not self.sort_reverse
-        else: self.sort_column, self.sort_reverse = col, False
-        def sort_key(trade):
-            value = trade.get(col)
-            if col in ("Quantity", "Price", "Commission", "Realized P&L"):
-                try: return float(value)
-                except (ValueError, TypeError): return -float('inf')
-            return str(value)
-        self.trades.sort(key=sort_key, reverse=self.sort_reverse)
+        else: self.sort_column, self.sort_reverse, self._sort_key = col, False, self._make_sort_key(col)
+        self.trades.sort(key=self._sort_key, reverse=self.sort_reverse)
         self._repopulate_tree()
 
+    def _make_sort_key(self, col):
+        """Builds the sort key for a column once, so the numeric/text branch isn't re-checked for every trade."""
+        if col in ("Quantity", "Price", "Commission", "Realized P&L"):
+            def sort_key(trade):
+                try: return float(trade.get(col))
+                except (ValueError, TypeError): return -math.inf
+        else:
+            def sort_key(trade): return str(trade.get(col))
+        return sort_key
+
+    def _insertion_index(self, trade):
+        """Binary-searches the sorted trade list for where a new trade belongs (ahead of equal keys)."""
+        key = self._sort_key(trade)
+        lo, hi = 0, len(self.trades)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key = self._sort_key(self.trades[mid])
+            if (mid_key > key) if self.sort_reverse else (mid_key < key): lo = mid + 1
+            else: hi = mid
+        return lo
+
     def _repopulate_tree(self):
-        for i in self.tree.get_children(): self.tree.delete(i)
+        self.tree.pack_forget() # Unmap the tree so the bulk insert doesn't redraw per row
+        self.tree.delete(*self.tree.get_children())
         self.exec_id_to_tree_id.clear()
+        self.exec_id_to_trade.clear()
         for trade in self.trades:
             values = self._format_trade_for_display(trade)
             tree_id = self.tree.insert("", "end", values=values)
-            if 'ExecId' in trade: self.exec_id_to_tree_id[trade['ExecId']] = tree_id
+            exec_id = trade.get('ExecId')
+            if exec_id: # Same rule as trade_exec_ids, so the lookups agree on which trades are indexed
+                self.exec_id_to_tree_id[exec_id] = tree_id
+                self.exec_id_to_trade[exec_id] = trade
+        self.tree.pack(fill=tk.BOTH, expand=True)
 
     def _load_app_config(self):
         (self.host, self.port, self.client_id, self.auto_refresh_enabled, self.auto_refresh_seconds, self.auto_connect_on_startup) = load_config()
 
     def _format_trade_for_display(self, trade_data):
-        display_values = []
-        for col in self.columns:
-            value = trade_data.get(col, "")
-            if col in ("Commission", "Realized P&L"):
-                try: display_values.append(f"{float(value):.2f}")
-                except (ValueError, TypeError): display_values.append("0.00")
-            else: display_values.append(value)
+        try: display_values = list(self.row_getter(trade_data))
+        except KeyError: display_values = [trade_data.get(col, "") for col in self.columns] # Records missing a column
+        for i in self.money_column_indexes:
+            try: display_values[i] = f"{float(display_values[i]):.2f}"
+            except (ValueError, TypeError): display_values[i] = "0.00"
         return tuple(display_values)
 
     def update_status(self, message, is_temporary=False):
         def _update():
             if not is_temporary: self.last_status_message = message
-            self.status_var.set(message)
-            if is_temporary: self.root.after(4000, lambda: self.status_var.set(self.last_status_message))
+            if self.status_restore_job: # A newer message supersedes any pending restore
+                self.root.after_cancel(self.status_restore_job)
+                self.status_restore_job = None
+            if message != self.status_var.get(): self.status_var.set(message)
+            if is_temporary: self.status_restore_job = self.root.after(4000, self._restore_status)
         self.root.after(0, _update)
 
+    def _restore_status(self):
+        self.status_restore_job = None
+        self.status_var.set(self.last_status_message)
+
     def reset_login_button(self):
         def _update():
             self.login_button.config(text="Login to TWS", state=tk.NORMAL)
@@ -512,23 +745,59 @@ class TradeLoggerApp:
             exec_id = trade_data.get("ExecId")
             if not exec_id or exec_id in self.trade_exec_ids: return
             self.trade_exec_ids.add(exec_id)
-            self.trades.insert(0, trade_data)
-            save_trades(self.trades)
-            self.sort_by_column(self.sort_column)
+            self.exec_id_to_trade[exec_id] = trade_data
+            index = self._insertion_index(trade_data)
+            self.trades.insert(index, trade_data)
+            self._save_queue.put(("append", trade_data))
+            self.exec_id_to_tree_id[exec_id] = self.tree.insert("", index, values=self._format_trade_for_display(trade_data))
         self.root.after(0, _update)
 
     def update_trade_financials(self, exec_id, commission, pnl):
         def _update():
-            trade_to_update = next((t for t in self.trades if t.get("ExecId") == exec_id), None)
+            trade_to_update = self.exec_id_to_trade.get(exec_id)
             tree_id = self.exec_id_to_tree_id.get(exec_id)
             if trade_to_update and tree_id:
                 pnl_to_store = 0.0 if pnl >= sys.float_info.max else pnl
+                commission_changed = trade_to_update.get("Commission") != commission
+                pnl_changed = trade_to_update.get("Realized P&L") != pnl_to_store
+                if not (commission_changed or pnl_changed): return # Each refresh re-sends reports for the whole day
                 trade_to_update["Commission"], trade_to_update["Realized P&L"] = commission, pnl_to_store
-                save_trades(self.trades)
-                values = self._format_trade_for_display(trade_to_update)
-                self.tree.item(tree_id, values=values)
+                self.dirty_exec_ids.add(exec_id)
+                if self.trades_flush_job is None:
+                    self.trades_flush_job = self.root.after(TRADES_FLUSH_SECONDS * 1000, self.flush_trades)
+                if commission_changed: self.tree.set(tree_id, "Commission", f"{commission:.2f}")
+                if pnl_changed: self.tree.set(tree_id, "Realized P&L", f"{pnl_to_store:.2f}")
         self.root.after(0, _update)
 
+    def flush_trades(self):
+        """Compacts the trade log once for all financial updates buffered since the last flush."""
+        if self.trades_flush_job:
+            self.root.after_cancel(self.trades_flush_job)
+            self.trades_flush_job = None
+        if self.dirty_exec_ids:
+            self._save_queue.put(("snapshot", list(self.trades)))
+            self.dirty_exec_ids.clear()
+
+    def _writer_loop(self):
+        """Writes queued trade-log updates off the Tk thread, coalescing each burst into one snapshot/append."""
+        while True:
+            items = [self._save_queue.get()]
+            if items[0] is not None: time.sleep(TRADES_WRITE_COALESCE_SECONDS)
+            while True:
+                try: items.append(self._save_queue.get_nowait())
+                except queue.Empty: break
+            snapshot, appends, stop = None, [], False
+            for item in items:
+                if item is None: stop = True
+                elif item[0] == "snapshot": snapshot, appends = item[1], [] # A snapshot already holds earlier appends
+                else: appends.append(item[1])
+            try:
+                if snapshot is not None: save_trades(snapshot)
+                if appends: append_trades(appends)
+            except Exception as e: # e.g. an unserializable value; keep the writer alive for later updates
+                print(f"Error: Could not write to trades file {TRADES_FILE}. Reason: {e}")
+            if stop: return
+
     def connect_to_tws(self, is_auto_connect=False):
         if self.ib_app and self.ib_app.isConnected():
             if not is_auto_connect: messagebox.showinfo("Info", "Already connected to TWS.")
@@ -576,10 +845,17 @@ class TradeLoggerApp:
         self.start_auto_refresh()
 
     def open_settings(self):
-        SettingsWindow(self.root, self)
+        if self.settings_window is None or not self.settings_window.winfo_exists():
+            self.settings_window = SettingsWindow(self.root, self)
+        else:
+            self.settings_window.show()
 
     def on_closing(self):
         self.stop_auto_refresh()
+        self.flush_trades()
+        self._save_queue.put(None) # Let the writer drain pending trade writes before exiting
+        self._writer_thread.join(timeout=5)
+        self.tv_pool.shutdown(wait=False, cancel_futures=True)
         if self.ib_app and self.ib_app.isConnected(): self.ib_app.disconnect()
         self.root.destroy()
 
@@ -588,111 +864,161 @@ class SettingsWindow(Toplevel):
         super().__init__(parent)
         self.app = app_instance
         self.title("Settings")
-        self.geometry("400x340") # Increased height
+        self.geometry("400x360") # Increased height, room for the inline error
         self.transient(parent)
         self.grab_set()
+        self.protocol("WM_DELETE_WINDOW", self.hide) # The dialog is hidden and reused rather than destroyed
 
-        (host, port, client_id, ref_enabled, ref_seconds, auto_conn_enabled) = load_config()
-        self.host_var, self.port_var, self.client_id_var = tk.StringVar(value=host), tk.StringVar(value=port), tk.StringVar(value=client_id)
-        self.refresh_enabled_var, self.refresh_seconds_var, self.auto_connect_var = tk.BooleanVar(value=ref_enabled), tk.StringVar(value=ref_seconds), tk.BooleanVar(value=auto_conn_enabled)
+        self.host_var, self.port_var, self.client_id_var = tk.StringVar(), tk.StringVar(), tk.StringVar()
+        self.refresh_enabled_var, self.refresh_seconds_var, self.auto_connect_var = tk.BooleanVar(), tk.StringVar(), tk.BooleanVar()
+        self.load_values()
 
         frame = ttk.Frame(self, padding="15")
         frame.pack(fill=tk.BOTH, expand=True)
 
         conn_frame = ttk.LabelFrame(frame, text="Connection", padding=10)
         conn_frame.pack(fill=tk.X, expand=True)
-        ttk.Label(conn_frame, text="TWS Host:").grid(row=0, column=0, sticky=tk.W, pady=2)
-        ttk.Entry(conn_frame, textvariable=self.host_var).grid(row=0, column=1, sticky=tk.EW)
-        ttk.Label(conn_frame, text="Port:").grid(row=1, column=0, sticky=tk.W, pady=2)
-        ttk.Entry(conn_frame, textvariable=self.port_var).grid(row=1, column=1, sticky=tk.EW)
-        ttk.Label(conn_frame, text="Client ID:").grid(row=2, column=0, sticky=tk.W, pady=2)
-        ttk.Entry(conn_frame, textvariable=self.client_id_var).grid(row=2, column=1, sticky=tk.EW)
-        conn_frame.columnconfigure(1, weight=1)
+        # Each form row is a packed frame with a fixed-width label, so labels line up without a grid solver
+        for text, variable in (("TWS Host:", self.host_var), ("Port:", self.port_var), ("Client ID:", self.client_id_var)):
+            row = ttk.Frame(conn_frame)
+            row.pack(side=tk.TOP, fill=tk.X, pady=2)
+            ttk.Label(row, text=text, width=12).pack(side=tk.LEFT)
+            ttk.Entry(row, textvariable=variable, style='Settings.TEntry').pack(side=tk.LEFT, fill=tk.X, expand=True)
 
         app_frame = ttk.LabelFrame(frame, text="Application", padding=10)
         app_frame.pack(fill=tk.X, expand=True, pady=10)
-        ttk.Checkbutton(app_frame, text="Enable Auto-Refresh", variable=self.refresh_enabled_var).grid(row=0, column=0, columnspan=2, sticky=tk.W)
-        ttk.Label(app_frame, text="Refresh Interval (sec):").grid(row=1, column=0, sticky=tk.W, pady=2)
-        ttk.Entry(app_frame, textvariable=self.refresh_seconds_var, width=10).grid(row=1, column=1, sticky=tk.W)
-        ttk.Checkbutton(app_frame, text="Auto-connect on startup", variable=self.auto_connect_var).grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=(5,0))
+        ttk.Checkbutton(app_frame, text="Enable Auto-Refresh", variable=self.refresh_enabled_var).pack(side=tk.TOP, anchor=tk.W)
+        interval_row = ttk.Frame(app_frame)
+        interval_row.pack(side=tk.TOP, fill=tk.X, pady=2)
+        ttk.Label(interval_row, text="Refresh Interval (sec):").pack(side=tk.LEFT)
+        ttk.Entry(interval_row, textvariable=self.refresh_seconds_var, width=10, style='Settings.TEntry').pack(side=tk.LEFT)
+        ttk.Checkbutton(app_frame, text="Auto-connect on startup", variable=self.auto_connect_var).pack(side=tk.TOP, anchor=tk.W, pady=(5,0))
 
         button_frame = ttk.Frame(frame)
         button_frame.pack(pady=(10,0), side=tk.BOTTOM)
-        ttk.Button(button_frame, text="OK", command=self.ok_and_close).pack(side=tk.LEFT, padx=5)
-        ttk.Button(button_frame, text="Cancel", command=self.destroy).pack(side=tk.LEFT, padx=5)
-        ttk.Button(button_frame, text="Apply", command=self.apply_settings).pack(side=tk.LEFT, padx=5)
+        self.ok_button = ttk.Button(button_frame, text="OK", command=self.ok_and_close)
+        self.ok_button.pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Cancel", command=self.hide).pack(side=tk.LEFT, padx=5)
+        self.apply_button = ttk.Button(button_frame, text="Apply", command=self.apply_settings)
+        self.apply_button.pack(side=tk.LEFT, padx=5)
+
+        # Packed above the buttons only while there is a validation error to show
+        self.error_label = ttk.Label(frame, text="", foreground="red")
 
-    def apply_settings(self):
+    def apply_settings(self, close_on_success=False):
+        """Validates the form and saves it on a worker thread. Returns False if validation failed."""
         try:
             port, client_id, seconds = int(self.port_var.get()), int(self.client_id_var.get()), int(self.refresh_seconds_var.get())
             if seconds < 1: raise ValueError("Interval must be positive")
-            if save_config(self.host_var.get(), port, client_id, self.refresh_enabled_var.get(), seconds, self.auto_connect_var.get()):
-                self.app.on_settings_changed()
-                return True
-            else:
-                messagebox.showerror("Save Error", f"Could not save settings to {CONFIG_FILE}.\nPlease check file permissions.", parent=self)
-                return False
         except ValueError:
-            messagebox.showerror("Input Error", "Port, Client ID, and Interval must be valid positive numbers.", parent=self)
+            self.error_label.configure(text="Port, Client ID, and Interval must be valid positive numbers.")
+            self.error_label.pack(side=tk.BOTTOM, pady=(5,0))
             return False
+        self.error_label.pack_forget()
+        self.ok_button.config(state=tk.DISABLED)
+        self.apply_button.config(state=tk.DISABLED)
+        settings = (self.host_var.get(), port, client_id, self.refresh_enabled_var.get(), seconds, self.auto_connect_var.get())
+        Thread(target=self._do_save, args=(settings, close_on_success), daemon=True).start()
+        return True
+
+    def _do_save(self, settings, close_on_success):
+        success = save_config(*settings)
+        self.after(0, self._on_save_done, success, close_on_success)
+
+    def _on_save_done(self, success, close_on_success):
+        self.ok_button.config(state=tk.NORMAL)
+        self.apply_button.config(state=tk.NORMAL)
+        if success:
+            self.app.on_settings_changed()
+            if close_on_success: self.hide()
+        else:
+            messagebox.showerror("Save Error", f"Could not save settings to {CONFIG_FILE}.\nPlease check file permissions.", parent=self)
+
+    def load_values(self):
+        """Seeds the form variables from the saved config."""
+        (host, port, client_id, ref_enabled, ref_seconds, auto_conn_enabled) = load_config()
+        self.host_var.set(host); self.port_var.set(port); self.client_id_var.set(client_id)
+        self.refresh_enabled_var.set(ref_enabled); self.refresh_seconds_var.set(ref_seconds); self.auto_connect_var.set(auto_conn_enabled)
+
+    def show(self):
+        """Re-opens the hidden dialog with freshly loaded values."""
+        self.load_values()
+        self.error_label.pack_forget()
+        self.deiconify()
+        self.lift()
+        self.grab_set()
+
+    def hide(self):
+        self.grab_release()
+        self.withdraw()
 
     def ok_and_close(self):
-        if self.apply_settings(): self.destroy()
+        self.apply_settings(close_on_success=True)
 
 class BalanceHistoryWindow(Toplevel):
+    SORT_KEYS = {"Account": attrgetter('account'), "DateTime": attrgetter('datetime'), "Balance": attrgetter('balance_f')}
+
     def __init__(self, parent):
         super().__init__(parent)
+        self.withdraw() # Build and fill the window offscreen; it is mapped and grabbed once at the end
         self.title("Account Balance History")
         self.geometry("600x400")
-        self.transient(parent)
-        self.grab_set()
 
         self.sort_column = "DateTime"
         self.sort_reverse = True
+        self._sorted_asc = {}
 
         frame = ttk.Frame(self, padding="10")
         frame.pack(fill=tk.BOTH, expand=True)
 
         self.columns = ("Account", "DateTime", "Balance")
         self.tree = ttk.Treeview(frame, columns=self.columns, show="headings")
-        self.tree.pack(fill=tk.BOTH, expand=True)
+        self.tree.tag_configure('odd', background='#f5f5f5') # Defined once; rows only carry the tag name
+        self._row_odd = {}
 
         headings = {"Account": {"width": 120}, "DateTime": {"width": 150}, "Balance": {"width": 120, "anchor": tk.E}}
+        self._sort_cbs = {col: partial(self.sort_by_column, col) for col in self.columns}
         for col, props in headings.items():
-            self.tree.heading(col, text=col, anchor=props.get("anchor", tk.W), command=lambda _col=col: self.sort_by_column(_col))
+            self.tree.heading(col, text=col, anchor=props.get("anchor", tk.W), command=self._sort_cbs[col])
             self.tree.column(col, width=props["width"], anchor=props.get("anchor", tk.W))
         
         self.history = load_balance_history()
         self.sort_by_column(self.sort_column) # Initial sort and populate
+        self.tree.pack(fill=tk.BOTH, expand=True) # Map the tree only once it is filled
+        self.update_idletasks() # Single layout pass for the fully built window
+        self.transient(parent)
+        self.deiconify()
+        self.grab_set()
 
     def sort_by_column(self, col):
         if self.sort_column == col: self.sort_reverse = not self.sort_reverse
         else: self.sort_column, self.sort_reverse = col, False
         
-        def sort_key(record):
-            value = record.get(col)
-            if col == "Balance":
-                try: return float(value)
-                except (ValueError, TypeError): return -float('inf')
-            return str(value)
-
-        self.history.sort(key=sort_key, reverse=self.sort_reverse)
+        if col not in self._sorted_asc: # The records never change while the window is open, so sort each column once
+            self._sorted_asc[col] = sorted(self.history, key=self.SORT_KEYS[col])
+        self.history = self._sorted_asc[col][::-1] if self.sort_reverse else self._sorted_asc[col]
         self._repopulate_tree()
     
     def _repopulate_tree(self):
-        for i in self.tree.get_children(): self.tree.delete(i)
-        for record in self.history:
-            balance_formatted = f"${record.get('Balance', 0.0):,.2f}"
-            values = (record.get("Account"), record.get("DateTime"), balance_formatted)
-            self.tree.insert("", "end", values=values)
+        if self.tree.get_children(): # Re-sort of the same records: move each row to its new index, keeping selection
+            for index, record in enumerate(self.history):
+                self.tree.move(record.iid, "", index)
+                odd = bool(index & 1)
+                if self._row_odd[record.iid] != odd: # Re-stripe only rows whose parity changed
+                    self._row_odd[record.iid] = odd
+                    self.tree.item(record.iid, tags=('odd',) if odd else ())
+            return
+        rows = [(record.iid, (record.account, record.datetime, record.balance_s)) for record in self.history]
+        for index, (iid, values) in enumerate(rows):
+            self._row_odd[iid] = bool(index & 1)
+            self.tree.insert("", "end", iid=iid, values=values, tags=('odd',) if index & 1 else ())
 
 
 if __name__ == "__main__":
+    # The guarded imports at the top already tried both packages; don't import them a second time
     missing_deps = []
-    try: from ibapi.client import EClient
-    except ImportError: missing_deps.append("ibapi")
-    try: from tradingview_ta import TA_Handler
-    except ImportError: missing_deps.append("tradingview_ta")
+    if not IBAPI_AVAILABLE: missing_deps.append("ibapi")
+    if not TRADINGVIEW_TA_AVAILABLE: missing_deps.append("tradingview_ta")
     if missing_deps:
          root = tk.Tk()
          root.withdraw()